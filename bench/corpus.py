@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:description:   벤치마크용 합성 입력을 만든다.
+                크기는 --scale 로 조절하고, 같은 seed 면 항상 같은 내용이 나온다.
+
+  corpus.py [--scale 1.0] [--seed 1] DIR
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+import zipfile
+
+# 만들어지는 것들 (DIR 기준 상대 경로)
+UPDATE_LOG = "update_all.log"
+XCODE_TREE = "xcode"
+EUCKR_TREE = "euckr"
+CP949_ZIP = "cp949.zip"
+ROUTES = "routes.txt"
+TIMESTAMP_LOG = "timestamps.log"
+ESCAPED_LOG = "escaped.log"
+MANIFEST = "corpus.json"
+
+HANGUL = [chr(c) for c in range(0xac00, 0xd7a4)]
+# cp949 로 표현할 수 있는 완성형 2350 자만 이름/내용에 쓴다.
+KSX1001 = [c for c in HANGUL if len(c.encode("euc-kr", "ignore")) == 2]
+
+
+def n(count, scale):
+    return max(1, int(count * scale))
+
+
+def hangul_word(rnd, lo=2, hi=6):
+    return "".join(rnd.choice(KSX1001) for _ in range(rnd.randint(lo, hi)))
+
+
+def gen_update_log(path, rnd, scale):
+    """update_all.zsh 가 남기는 로그와 비슷한 형식"""
+    sections = ["Homebrew", "Mac App Store", "Rust", "Node.js", "Ruby", "Python pip", ".NET", "Oh My Zsh"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n(200000, scale)):
+            if i % 5000 == 0:
+                f.write(f"\n==> Updating {rnd.choice(sections)}...\n")
+            r = rnd.random()
+            pkg = f"pkg{rnd.randint(0, 5000)}"
+            if r < 0.3:
+                f.write(f"==> Upgrading {pkg} {rnd.randint(0, 9)}.{rnd.randint(0, 20)} -> "
+                        f"{rnd.randint(0, 9)}.{rnd.randint(0, 20)}\n")
+            elif r < 0.35:
+                f.write(f"Warning: {pkg} is already installed and up-to-date.\n")
+            elif r < 0.3501:
+                f.write("A reboot is required to finish installing updates.\n")
+            else:
+                f.write(f"  Downloading https://ghcr.io/v2/homebrew/core/{pkg}/blobs/sha256:"
+                        f"{rnd.getrandbits(128):032x}\n")
+
+
+def gen_xcode_tree(path, rnd, scale):
+    """chkimg.py 용 .m/.h 소스와 png/gif 이미지"""
+    images = [f"img_{i:04d}" for i in range(n(300, scale))]
+    for d in range(n(10, scale)):
+        sub = os.path.join(path, f"Classes{d}")
+        res = os.path.join(path, f"Resources{d}")
+        os.makedirs(sub, exist_ok=True)
+        os.makedirs(res, exist_ok=True)
+        for i in range(10):
+            ext = ".m" if i % 2 else ".h"
+            with open(os.path.join(sub, f"View{d}_{i}{ext}"), "w") as f:
+                for ln in range(200):
+                    if rnd.random() < 0.1:
+                        f.write(f'    [UIImage imageNamed:@"{rnd.choice(images)}.png"];\n')
+                    else:
+                        f.write(f"    self.value{ln} = [[NSObject alloc] init];\n")
+    for i, name in enumerate(images):
+        res = os.path.join(path, f"Resources{i % n(10, scale)}")
+        with open(os.path.join(res, name + (".png" if i % 3 else ".gif")), "wb") as f:
+            f.write(rnd.randbytes(rnd.randint(256, 8192)))
+    os.makedirs(os.path.join(path, "build"), exist_ok=True)
+
+
+def gen_euckr_tree(path, rnd, scale):
+    """EUC-KR 이름과 EUC-KR 내용을 가진 파일 트리 (utf8.py, kr2u8.py)"""
+    bpath = os.fsencode(path)
+    for d in range(n(50, scale)):
+        sub = os.path.join(bpath, f"{d:02d}_{hangul_word(rnd)}".encode("euc-kr"))
+        os.makedirs(sub, exist_ok=True)
+        for i in range(40):
+            name = f"{hangul_word(rnd)}_{i}.txt".encode("euc-kr")
+            text = "\n".join(" ".join(hangul_word(rnd) for _ in range(10)) for _ in range(rnd.randint(10, 60)))
+            with open(os.path.join(sub, name), "wb") as f:
+                f.write(text.encode("euc-kr"))
+
+
+class _CP949Info(zipfile.ZipInfo):
+    """한글 윈도우 압축 프로그램처럼 UTF-8 플래그 없이 cp949 로 이름을 기록한다."""
+
+    def _encodeFilenameFlags(self):
+        return self.filename.encode("cp949"), self.flag_bits
+
+
+def gen_cp949_zip(path, rnd, scale):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(n(500, scale)):
+            name = f"{hangul_word(rnd)}/{hangul_word(rnd)}_{i}.dat"
+            size = rnd.choice([1 << 10, 16 << 10, 256 << 10, 1 << 20])
+            # 압축은 되지만 너무 잘 되지는 않도록 반복되는 난수 블록
+            block = rnd.randbytes(4096)
+            info = _CP949Info(name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            z.writestr(info, (block * (size // 4096 + 1))[:size])
+
+
+def gen_routes(path, rnd, scale):
+    """`ip route` 형식. 약 10% 가 del_rttbl.py 기본 규칙에 걸린다."""
+    with open(path, "w") as f:
+        f.write("default via 172.30.1.254 dev en0\n")
+        for _ in range(n(20000, scale)):
+            r = rnd.random()
+            plen = rnd.randint(16, 32)
+            if r < 0.1:
+                f.write(f"172.30.1.{rnd.randint(0, 255)}/{max(plen, 24)} via 10.211.96.{rnd.randint(1, 254)} "
+                        f"dev utun{rnd.randint(0, 3)}\n")
+            elif r < 0.5:
+                f.write(f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.0/{plen} "
+                        f"via 10.211.96.241 dev utun2 proto static metric {rnd.randint(0, 1000)}\n")
+            else:
+                f.write(f"10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.0/24 dev en{rnd.randint(0, 3)} scope link\n")
+
+
+def gen_timestamp_log(path, rnd, scale):
+    t = 1700000000
+    with open(path, "w") as f:
+        for i in range(n(500000, scale)):
+            t += rnd.randint(0, 3)
+            ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t))
+            f.write(f"{ts} INFO  [worker-{i % 16}] request id={rnd.getrandbits(32):08x} done in {rnd.randint(1, 999)}ms\n")
+
+
+def gen_escaped_log(path, rnd, scale):
+    """ucp2utf8.py 용 '\\Uc11c\\Ubc84...' 로그"""
+    with open(path, "w") as f:
+        for i in range(n(100000, scale)):
+            msg = " ".join("".join("\\U%04x" % ord(c) for c in hangul_word(rnd)) for _ in range(4))
+            f.write(f"2024-01-01 00:00:{i % 60:02d} ERROR {msg}\n")
+
+
+GENERATORS = [
+    (UPDATE_LOG, gen_update_log, False),
+    (XCODE_TREE, gen_xcode_tree, True),
+    (EUCKR_TREE, gen_euckr_tree, True),
+    (CP949_ZIP, gen_cp949_zip, False),
+    (ROUTES, gen_routes, False),
+    (TIMESTAMP_LOG, gen_timestamp_log, False),
+    (ESCAPED_LOG, gen_escaped_log, False),
+]
+
+
+def generate(top, scale=1.0, seed=1):
+    """top 에 corpus 를 만든다. 같은 scale/seed 로 이미 만들어져 있으면 그대로 쓴다."""
+    manifest = os.path.join(top, MANIFEST)
+    want = {"scale": scale, "seed": seed}
+    try:
+        with open(manifest) as f:
+            if json.load(f) == want:
+                return top
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(top, exist_ok=True)
+    for name, gen, is_dir in GENERATORS:
+        path = os.path.join(top, name)
+        if is_dir:
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        print(f"generate {path}")
+        gen(path, random.Random(f"{seed}:{name}"), scale)
+
+    with open(manifest, "w") as f:
+        json.dump(want, f)
+    return top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 입력 생성")
+    parser.add_argument("dir", help="만들 디렉토리")
+    parser.add_argument("--scale", type=float, default=1.0, help="입력 크기 배율")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    generate(args.dir, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
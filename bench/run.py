@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:description:   파이썬 스크립트들을 합성 입력(corpus.py)으로 실행해서
+                실행 시간과 최대 메모리(RSS)를 JSON 으로 남기고, 이전 결과와 비교한다.
+
+  run.py [-o bench.json] [--compare baseline.json] [--only utf8,unzip] [--scale 1.0] [-r 3]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PY = sys.executable
+
+
+def script(name):
+    return os.path.join(ROOT, name)
+
+
+# 각 케이스는 (corpus 디렉토리, 작업 디렉토리) 를 받아 준비를 마치고
+# 측정할 {"argv": [...], "env": {...}} 를 반환한다. 준비 시간은 측정하지 않는다.
+
+def copy_euckr(c, w):
+    tree = os.path.join(w, "tree")
+    shutil.copytree(os.path.join(c, corpus.EUCKR_TREE), tree)
+    return tree
+
+
+def case_python_startup(c, w):
+    """다른 케이스의 시간/메모리를 볼 때 기준이 되는 빈 인터프리터"""
+    return {"argv": [PY, "-c", "pass"]}
+
+
+def case_chkimg(c, w):
+    return {"argv": ["python2", script("chkimg.py"), os.path.join(c, corpus.XCODE_TREE)]}
+
+
+def case_utf8_copy(c, w):
+    return {"argv": [PY, script("utf8.py"), copy_euckr(c, w)]}
+
+
+def case_utf8_sync_noop(c, w):
+    tree = copy_euckr(c, w)
+    subprocess.run([PY, script("utf8.py"), "-s", tree], stdout=subprocess.DEVNULL, check=True)
+    return {"argv": [PY, script("utf8.py"), "-s", tree]}
+
+
+def case_utf8_link(c, w):
+    return {"argv": [PY, script("utf8.py"), "-l", copy_euckr(c, w)]}
+
+
+def case_kr2u8(c, w):
+    return {"argv": [PY, script("kr2u8/kr2u8.py"), "--no-backup", copy_euckr(c, w)]}
+
+
+def case_unzip(c, w):
+    return {"argv": [PY, script("unzip_cp949.py"), os.path.join(c, corpus.CP949_ZIP), os.path.join(w, "out")]}
+
+
+def case_unzip_update(c, w):
+    argv = [PY, script("unzip_cp949.py"), "-u", os.path.join(c, corpus.CP949_ZIP), os.path.join(w, "out")]
+    subprocess.run(argv, stdout=subprocess.DEVNULL, check=True)
+    return {"argv": argv}
+
+
+def case_del_rttbl(c, w):
+    return {"argv": [PY, script("del_rttbl.py"), "-n", "-f", os.path.join(c, corpus.ROUTES)]}
+
+
+def case_utc2kst_stream(c, w):
+    return {"argv": [PY, script("utc2kst.py"), "-s", os.path.join(c, corpus.TIMESTAMP_LOG)]}
+
+
+def case_utc2kst_inplace(c, w):
+    log = os.path.join(w, "ts.log")
+    shutil.copyfile(os.path.join(c, corpus.TIMESTAMP_LOG), log)
+    return {"argv": [PY, script("utc2kst.py"), "-i", log]}
+
+
+def case_ucp2utf8(c, w):
+    return {"argv": [PY, script("ucp2utf8.py"), "-s", os.path.join(c, corpus.ESCAPED_LOG)]}
+
+
+def case_upsum_parse(c, w):
+    code = "import sys; from upsum.__main__ import parse_log_file; parse_log_file(sys.argv[1])"
+    return {"argv": [PY, "-c", code, os.path.join(c, corpus.UPDATE_LOG)],
+            "env": {"PYTHONPATH": script("macos/upsum/src")}}
+
+
+CASES = {
+    "python-startup": case_python_startup,
+    "chkimg": case_chkimg,
+    "utf8-copy": case_utf8_copy,
+    "utf8-sync-noop": case_utf8_sync_noop,
+    "utf8-link": case_utf8_link,
+    "kr2u8": case_kr2u8,
+    "unzip": case_unzip,
+    "unzip-update": case_unzip_update,
+    "del_rttbl": case_del_rttbl,
+    "utc2kst-stream": case_utc2kst_stream,
+    "utc2kst-inplace": case_utc2kst_inplace,
+    "ucp2utf8": case_ucp2utf8,
+    "upsum-parse": case_upsum_parse,
+}
+
+
+# Linux 의 ru_maxrss 는 fork 한 부모의 최대 RSS 를 물려받으므로 하네스에서 바로 띄우면
+# 하네스 자신의 RSS 가 찍힌다. 메모리를 거의 쓰지 않는 런처가 fork/exec 하고 wait4 한다.
+# (런처 자체의 RSS 가 바닥값이 되므로 python-startup 케이스를 기준으로 같이 남긴다.)
+LAUNCHER = """
+import os, sys, time
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    finally:
+        os._exit(127)
+_, status, ru = os.wait4(pid, 0)
+elapsed = time.perf_counter() - start
+with open(sys.argv[1], "w") as f:
+    f.write("%r %d %d" % (elapsed, ru.ru_maxrss, os.waitstatus_to_exitcode(status)))
+"""
+
+
+def measure(argv, env=None):
+    """:return: (경과 초, 최대 RSS 바이트, 종료 코드, stderr 마지막 줄)"""
+    full_env = dict(os.environ, **(env or {}))
+    with tempfile.TemporaryFile() as err, tempfile.NamedTemporaryFile("r") as result:
+        subprocess.run([PY, "-S", "-c", LAUNCHER, result.name] + argv,
+                       stdout=subprocess.DEVNULL, stderr=err, env=full_env, check=False)
+        fields = result.read().split()
+        err.seek(0)
+        lines = err.read().decode("utf-8", "replace").strip().splitlines()
+    if len(fields) != 3:
+        return 0.0, 0, -1, lines[-1] if lines else "launcher failed"
+    elapsed, maxrss, rc = float(fields[0]), int(fields[1]), int(fields[2])
+    # Linux 는 KB, macOS 는 바이트
+    rss = maxrss if sys.platform == "darwin" else maxrss * 1024
+    return elapsed, rss, rc, lines[-1] if lines else ""
+
+
+def run_case(name, corpus_dir, repeat):
+    times = []
+    rss = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as work:
+            try:
+                spec = CASES[name](corpus_dir, work)
+            except (OSError, subprocess.CalledProcessError) as e:
+                return {"status": "error", "error": f"prepare: {e}"}
+            if shutil.which(spec["argv"][0]) is None:
+                return {"status": "skipped", "error": f"{spec['argv'][0]} not found"}
+            elapsed, peak, rc, last = measure(spec["argv"], spec.get("env"))
+            if rc != 0:
+                return {"status": "error", "error": last or f"exit {rc}"}
+            times.append(elapsed)
+            rss = max(rss, peak)
+    return {
+        "status": "ok",
+        "runs": repeat,
+        "wall_min": round(min(times), 4),
+        "wall_median": round(statistics.median(times), 4),
+        "peak_rss": rss,
+    }
+
+
+def compare(results, baseline, threshold):
+    """:return: 느려진 케이스 목록"""
+    slower = []
+    print(f"{'case':18} {'base(s)':>9} {'now(s)':>9} {'ratio':>7} {'rss(MB)':>9}")
+    for name, r in results.items():
+        b = baseline.get("results", {}).get(name)
+        if r["status"] != "ok" or not b or b.get("status") != "ok":
+            print(f"{name:18} {'-':>9} {'-':>9} {'-':>7} {'-':>9}  {r['status']}")
+            continue
+        ratio = r["wall_median"] / b["wall_median"] if b["wall_median"] else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            slower.append(name)
+        print(f"{name:18} {b['wall_median']:9.3f} {r['wall_median']:9.3f} {ratio:7.2f} "
+              f"{r['peak_rss'] / (1 << 20):9.1f}{mark}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="파이썬 스크립트 벤치마크")
+    parser.add_argument("-o", "--output", default="bench.json", help="결과 JSON (기본: bench.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="이 결과 JSON 과 비교해서 느려졌으면 1 로 종료")
+    parser.add_argument("--threshold", type=float, default=0.2, help="느려졌다고 볼 비율 (기본: 0.2 = 20%%)")
+    parser.add_argument("--only", help="쉼표로 구분한 케이스만 실행 (%s)" % ",".join(CASES))
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "scripts-bench-corpus"),
+                        help="합성 입력 디렉토리 (없으면 만든다)")
+    parser.add_argument("--scale", type=float, default=1.0, help="입력 크기 배율")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="케이스별 반복 횟수")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+
+    corpus.generate(args.corpus, args.scale, args.seed)
+
+    results = {}
+    for name in names:
+        r = run_case(name, args.corpus, args.repeat)
+        results[name] = r
+        if r["status"] == "ok":
+            print(f"{name:18} {r['wall_median']:8.3f}s  {r['peak_rss'] / (1 << 20):7.1f}MB")
+        else:
+            print(f"{name:18} {r['status']}: {r['error']}")
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("scale") != args.scale:
+            print(f"warning: baseline scale {baseline.get('meta', {}).get('scale')} != {args.scale}")
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,41 @@
 #!/usr/bin/env python3
+"""
+VPN(utun) 이 잡아 놓은 172.30.1.x 라우트를 지운다.
+
+규칙은 `dst=172.30.1.0/24 via=10.211.0.0/16 dev=utun*` 형식이고
+(-r 로 여러 개, -c 로 파일에서 읽음), dst 네트워크를 키로 하는 prefix trie 에
+넣어서 라우트마다 dst 를 포함하는 규칙만 찾은 뒤 via/dev 를 비교한다.
+
+찾은 라우트는 한 번에 모아서 지운다.
+Linux 는 `ip -batch -` 한 번, macOS 는 `sudo sh` 한 번에 route 명령들을 넘긴다.
+
+-w 로 실행하면 계속 떠 있으면서 라우트 변경 이벤트를 받아 새로 생긴 라우트를
+바로 지운다. Linux 는 `ip monitor route` 의 추가 이벤트를 바로 규칙에 맞춰 보고,
+macOS 는 `route -n monitor` 의 RTM_ADD 이벤트가 오면 `ip route` 를 다시 읽는다.
+테스트는 network namespace 안에서 할 수 있다.
 
+  unshare -rn sh -c 'ip link set lo up; ip addr add 10.211.0.1/16 dev lo;
+                     ./del_rttbl.py -w -r "dst=172.30.1.0/24 via=10.211.0.0/16"'
+"""
+
+import argparse
+import fnmatch
+import ipaddress
 import os
+import platform
+import select
+import signal
 import subprocess
+import sys
+import time
+
+DEFAULT_RULES = ["dst=172.30.1.0/24 via=10.211.0.0/16 dev=utun*"]
 
-ck001 = "172.30.1."
-ck002 = "via"
-ck003 = "10.211."
-ck004 = "dev"
-ck005 = "utun"
-
-print(f"FIND RULE : '{ck001}*' '{ck002}' '{ck003}*' '{ck004}' '{ck005}'")
-
-p = subprocess.Popen("ip route",
-                     stdout=subprocess.PIPE,
-                     stderr=subprocess.PIPE,
-                     shell=True)
-(output, err) = p.communicate()
-outstr = str(output, 'utf-8')
-if False:
-    outstr = """
+# 이벤트가 몰려 올 때 이 시간(초) 동안 더 오는 이벤트를 모아서 한 번에 지운다.
+WATCH_BATCH_SEC = 0.05
+
+# `ip route` 출력 예 (--sample)
+SAMPLE = """
 default via link#16 dev utun2
 default via 172.30.1.254 dev en0
 1.0.0.0/8 via 10.211.96.241 dev utun2
@@ -59,15 +76,307 @@ default via 172.30.1.254 dev en0
 255.255.255.255/32 dev en0  scope link
 """
 
-for line in outstr.split('\n'):
+
+def get_routes():
+    p = subprocess.Popen("ip route",
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE,
+                         shell=True)
+    (output, err) = p.communicate()
+    return str(output, 'utf-8')
+
+
+class Rule:
+    """dst 를 포함하고, via 게이트웨이가 via 네트워크 안에 있고, dev 가 패턴과 맞는 라우트"""
+
+    def __init__(self, text):
+        self.text = text
+        self.dst = None
+        self.via = None
+        self.dev = None
+        for field in text.split():
+            key, sep, value = field.partition("=")
+            if not sep:
+                raise ValueError(f"bad rule field '{field}' in '{text}'")
+            if key == "dst":
+                self.dst = ipaddress.ip_network(value, strict=False)
+            elif key == "via":
+                self.via = ipaddress.ip_network(value, strict=False)
+            elif key == "dev":
+                self.dev = value
+            else:
+                raise ValueError(f"unknown rule key '{key}' in '{text}'")
+
+    def match_rest(self, route):
+        """dst 이외의 조건"""
+        if self.via is not None:
+            gw = route.get("via")
+            if gw is None or gw.version != self.via.version or gw not in self.via:
+                return False
+        if self.dev is not None:
+            dev = route.get("dev")
+            if dev is None or not fnmatch.fnmatchcase(dev, self.dev):
+                return False
+        return True
+
+    def __str__(self):
+        return self.text
+
+
+class PrefixTrie:
+    """네트워크 주소의 비트로 내려가는 binary trie. 노드는 [자식0, 자식1, 규칙들]."""
+
+    def __init__(self):
+        self.roots = {4: [None, None, []], 6: [None, None, []]}
+
+    def add(self, net, rule):
+        node = self.roots[net.version]
+        addr = int(net.network_address)
+        bits = net.max_prefixlen
+        for i in range(net.prefixlen):
+            b = (addr >> (bits - 1 - i)) & 1
+            if node[b] is None:
+                node[b] = [None, None, []]
+            node = node[b]
+        node[2].append(rule)
+
+    def containing(self, net):
+        """net 을 포함하는(prefix 가 같거나 짧은) 모든 네트워크의 규칙"""
+        node = self.roots[net.version]
+        addr = int(net.network_address)
+        bits = net.max_prefixlen
+        found = list(node[2])
+        for i in range(net.prefixlen):
+            node = node[(addr >> (bits - 1 - i)) & 1]
+            if node is None:
+                break
+            found.extend(node[2])
+        return found
+
+
+def load_rules(texts, files):
+    rules = [Rule(t) for t in texts]
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    rules.append(Rule(line))
+    return rules
+
+
+def build_trie(rules):
+    trie = PrefixTrie()
+    for rule in rules:
+        if rule.dst is None:
+            trie.add(ipaddress.ip_network("0.0.0.0/0"), rule)
+            trie.add(ipaddress.ip_network("::/0"), rule)
+        else:
+            trie.add(rule.dst, rule)
+    return trie
+
+
+def parse_route(line):
+    """`ip route` 한 줄을 {"dst": 네트워크, "via": 주소, "dev": 이름, ...} 으로. 모르는 형식은 None."""
     t = line.split()
-    # print(t[0][:9])
-    if len(t) == 5 \
-       and t[0][:len(ck001)] == ck001 \
-       and t[1][:len(ck002)] == ck002 \
-       and t[2][:len(ck003)] == ck003 \
-       and t[3][:len(ck004)] == ck004 \
-       and t[4][:len(ck005)] == ck005:
-        cmd = f"sudo route -n delete {t[0]}"
-        print(f"EXECUTE : {cmd}")
-        os.system(cmd)
+    if not t:
+        return None
+    dst = t[0]
+    # "unreachable 10.0.0.0/8", "blackhole ..." 처럼 타입이 앞에 오는 경우
+    if dst in ("unicast", "local", "broadcast", "multicast", "unreachable",
+               "blackhole", "prohibit", "throw", "nat", "anycast") and len(t) > 1:
+        t = t[1:]
+        dst = t[0]
+    try:
+        net = ipaddress.ip_network("0.0.0.0/0" if dst == "default" else dst, strict=False)
+    except ValueError:
+        return None
+    route = {"dst": net, "name": dst}
+    for key, value in zip(t[1:], t[2:]):
+        if key == "via" and "via" not in route:
+            try:
+                route["via"] = ipaddress.ip_address(value)
+            except ValueError:
+                pass
+        elif key == "dev" and "dev" not in route:
+            route["dev"] = value
+    return route
+
+
+def match_routes(outstr, trie):
+    """삭제할 라우트 목록 (parse_route 의 dict). 같은 dst 가 여럿일 수 있어 via/dev 도 같이 넘긴다."""
+    found = []
+    for line in outstr.split('\n'):
+        route = parse_route(line)
+        if route is None:
+            continue
+        for rule in trie.containing(route["dst"]):
+            if rule.match_rest(route):
+                found.append(route)
+                break
+    return found
+
+
+def ip_route_del(route):
+    """`ip -batch` 한 줄. dst 만 주면 커널이 dst 가 같은 첫 라우트를 지우므로 via/dev 까지 지정한다."""
+    line = f"route del {route['name']}"
+    if "via" in route:
+        line += f" via {route['via']}"
+    if "dev" in route:
+        line += f" dev {route['dev']}"
+    return line
+
+
+def darwin_route_delete(route):
+    """macOS route(8) 한 줄. 게이트웨이가 있으면 게이트웨이로, 없으면 -ifscope 로 라우트를 고른다."""
+    if "via" in route:
+        return f"route -n delete {route['name']} {route['via']}"
+    if "dev" in route:
+        return f"route -n delete -ifscope {route['dev']} {route['name']}"
+    return f"route -n delete {route['name']}"
+
+
+def batch_script(routes):
+    """(실행할 명령, stdin 으로 넘길 스크립트)"""
+    if platform.system() == "Darwin":
+        script = "".join(darwin_route_delete(r) + "\n" for r in routes)
+        cmd = ["sh", "-s"]
+    else:
+        script = "".join(ip_route_del(r) + "\n" for r in routes)
+        cmd = ["ip", "-force", "-batch", "-"]
+    if os.geteuid() != 0:
+        cmd = ["sudo"] + cmd
+    return cmd, script
+
+
+def delete_routes(routes, dry_run=False):
+    cmd, script = batch_script(routes)
+    print(f"EXECUTE : {' '.join(cmd)}")
+    for line in script.splitlines():
+        print(f"  {line}")
+    if dry_run:
+        return 0
+    p = subprocess.run(cmd, input=script, text=True, check=False)
+    return p.returncode
+
+
+def monitor_command():
+    if platform.system() == "Darwin":
+        return ["route", "-n", "monitor"]
+    return ["ip", "monitor", "route"]
+
+
+def read_lines(fd, buf):
+    """fd 에서 읽을 수 있는 만큼 읽어서 완성된 줄들을 반환한다. EOF 면 None."""
+    data = os.read(fd, 65536)
+    if not data:
+        return None
+    buf.extend(data)
+    *lines, rest = buf.split(b"\n")
+    buf[:] = rest
+    return [str(line, "utf-8", "replace") for line in lines]
+
+
+def watch_events(lines, trie, darwin):
+    """이벤트 줄들에서 지울 라우트 목록"""
+    if darwin:
+        # route monitor 출력은 여러 줄짜리 메시지라서 추가가 있으면 전체를 다시 본다.
+        if any(line.startswith("RTM_ADD") for line in lines):
+            return match_routes(get_routes(), trie)
+        return []
+    adds = [line for line in lines if line and not line.startswith("Deleted ")]
+    return match_routes("\n".join(adds), trie)
+
+
+def watch(trie, dry_run=False):
+    """라우트 변경 이벤트를 받아 규칙에 맞는 라우트를 생기는 대로 지운다."""
+    darwin = platform.system() == "Darwin"
+    cmd = monitor_command()
+    print(f"WATCH : {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    fd = proc.stdout.fileno()
+    buf = bytearray()
+
+    # 모니터를 띄운 뒤에 이미 있는 라우트를 한 번 정리해야 그 사이 생긴 라우트를 놓치지 않는다.
+    dests = match_routes(get_routes(), trie)
+    if dests:
+        delete_routes(dests, dry_run)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            lines = read_lines(fd, buf)
+            if lines is None:
+                break
+            t0 = time.perf_counter()
+            while select.select([fd], [], [], WATCH_BATCH_SEC)[0]:
+                more = read_lines(fd, buf)
+                if more is None:
+                    break
+                lines.extend(more)
+            dests = watch_events(lines, trie, darwin)
+            if dests:
+                delete_routes(dests, dry_run)
+                print(f"{len(dests)} routes{' (dry-run)' if dry_run else ''} : "
+                      f"{(time.perf_counter() - t0) * 1000:.1f}ms after event")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proc.terminate()
+        proc.wait()
+    return proc.returncode if proc.returncode and proc.returncode > 0 else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VPN 라우트를 한 번에 지운다.")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="지울 라우트만 보여준다")
+    parser.add_argument("--sample", action="store_true", help="`ip route` 대신 내장 예제를 사용한다")
+    parser.add_argument("-f", "--file", help="`ip route` 대신 이 파일(- 는 stdin)의 라우트 목록을 사용한다")
+    parser.add_argument("-r", "--rule", action="append", default=[],
+                        help="규칙 (예: 'dst=172.30.1.0/24 via=10.211.0.0/16 dev=utun*'), 여러 번 쓸 수 있다")
+    parser.add_argument("-c", "--config", action="append", default=[],
+                        help="한 줄에 규칙 하나씩 적은 파일, 여러 번 쓸 수 있다")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="라우트 변경을 지켜보면서 규칙에 맞는 라우트가 생기면 바로 지운다")
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(args.rule, args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not rules:
+        rules = load_rules(DEFAULT_RULES, [])
+    for rule in rules:
+        print(f"FIND RULE : {rule}")
+    trie = build_trie(rules)
+
+    if args.watch:
+        return watch(trie, args.dry_run)
+
+    t0 = time.perf_counter()
+    if args.sample:
+        outstr = SAMPLE
+    elif args.file == "-":
+        outstr = sys.stdin.read()
+    elif args.file:
+        with open(args.file, encoding="utf-8") as f:
+            outstr = f.read()
+    else:
+        outstr = get_routes()
+    t1 = time.perf_counter()
+    dests = match_routes(outstr, trie)
+    t2 = time.perf_counter()
+
+    rc = 0
+    if dests:
+        rc = delete_routes(dests, args.dry_run or args.sample)
+    t3 = time.perf_counter()
+
+    print(f"{len(dests)} routes{' (dry-run)' if args.dry_run or args.sample else ''} : "
+          f"read {(t1 - t0) * 1000:.1f}ms, match {(t2 - t1) * 1000:.1f}ms, "
+          f"delete {(t3 - t2) * 1000:.1f}ms")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:description:   kr2u8/u82kr 스크립트들을 한 프로세스에서 처리한다.
+                find -exec 로 파일마다 bash + iconv + mv 를 띄우는 대신
+                파이썬에서 직접 디코딩하고, 파일들은 프로세스 풀로 병렬 처리한다.
+
+  kr2u8.py FILE|DIR ...             kr2u8 / kr2u8R   (내용 UHC -> UTF-8)
+  kr2u8.py -R FILE|DIR ...          u82kr / u82krR   (내용 UTF-8 -> UHC)
+  kr2u8.py -f DIR ...               kr2u8fR          (이름 UHC -> UTF-8)
+  kr2u8.py -f -R DIR ...            u82krfR          (이름 UTF-8 -> UHC)
+  kr2u8.py --bench DIR              기존 쉘 파이프라인과 속도 비교
+"""
+
+import argparse
+import codecs
+import fnmatch
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# 한번에 읽어서 디코딩하는 크기
+CHUNK_SIZE = 1 << 20
+
+KR = 'cp949'  # iconv 의 UHC
+U8 = 'utf-8'
+
+OK = 0
+SKIP = 1
+FAIL = 2
+
+COLOR = sys.stdout.isatty()
+
+
+def paint(path, msg, ok):
+    if not COLOR:
+        return f"{path} {msg}"
+    return f"\033[1;34m{path} \033[1;{32 if ok else 31}m{msg}\033[0;0m"
+
+
+def codecs_for(reverse):
+    """(원본 인코딩, 대상 인코딩)"""
+    return (U8, KR) if reverse else (KR, U8)
+
+
+def convert_file(path, reverse=False, backup=True):
+    """
+    파일 내용을 CHUNK_SIZE 씩 읽어 변환한 뒤 임시 파일과 교체한다.
+    :return: (path, OK|SKIP|FAIL, 메시지)
+    """
+    src_enc, dst_enc = codecs_for(reverse)
+    decoder = codecs.getincrementaldecoder(src_enc)()
+    encoder = codecs.getincrementalencoder(dst_enc)()
+    # kr2u8 은 이미 UTF-8 인 파일을 UHC 로 잘못 읽지 않도록 같이 검사한다.
+    u8check = None if reverse else codecs.getincrementaldecoder(U8)()
+    ascii_only = True
+
+    dirname = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(prefix='.kr2u8-', dir=dirname)
+    try:
+        with open(path, 'rb') as fin, os.fdopen(fd, 'wb') as fout:
+            while True:
+                raw = fin.read(CHUNK_SIZE)
+                final = not raw
+                if ascii_only and not raw.isascii():
+                    ascii_only = False
+                if u8check is not None:
+                    try:
+                        u8check.decode(raw, final)
+                    except UnicodeDecodeError:
+                        u8check = None
+                fout.write(encoder.encode(decoder.decode(raw, final), final))
+                if final:
+                    break
+        if ascii_only:
+            os.unlink(tmp)
+            return path, SKIP, "is ascii"
+        if u8check is not None:
+            os.unlink(tmp)
+            return path, FAIL, "is already UTF-8"
+        shutil.copymode(path, tmp)
+        if backup:
+            bak = path + '.bak'
+            if os.path.lexists(bak):
+                os.unlink(bak)
+            os.link(path, bak)
+        os.replace(tmp, path)
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        os.unlink(tmp)
+        return path, FAIL, "is not korean UTF-8" if reverse else "is not korean"
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path, OK, "convert succeeded"
+
+
+def _convert_file(args):
+    try:
+        return convert_file(*args)
+    except OSError as e:
+        return args[0], FAIL, str(e)
+
+
+def convert_name(name, reverse=False):
+    """bytes 파일명을 변환한다. 변환할 필요가 없거나 할 수 없으면 None."""
+    if name.isascii():
+        return None
+    src_enc, dst_enc = codecs_for(reverse)
+    if not reverse:
+        try:
+            name.decode(U8)
+            return None
+        except UnicodeDecodeError:
+            pass
+    try:
+        return name.decode(src_enc).encode(dst_enc)
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return None
+
+
+def rename_tree(top, reverse=False):
+    """
+    top 아래(top 포함하지 않음)의 파일/디렉토리 이름을 변환한다.
+    rename 은 순서가 중요하고 메타데이터만 바뀌므로 하위 항목부터 차례로 처리한다.
+    """
+    count = 0
+    for root, dirs, files in os.walk(os.fsencode(top), topdown=False):
+        for name in files + dirs:
+            new = convert_name(name, reverse)
+            src = os.path.join(root, name)
+            if new is None:
+                if not name.isascii():
+                    print(paint(os.fsdecode(src), "is not korean UTF-8" if reverse else "is not EUC-KR", False))
+                continue
+            dest = os.path.join(root, new)
+            if os.path.lexists(dest):
+                print(paint(os.fsdecode(dest), "already exists", False))
+                continue
+            os.rename(src, dest)
+            print(paint(os.fsdecode(dest), "convert succeeded", True))
+            count += 1
+    return count
+
+
+def walk_files(paths, pattern=None):
+    """find -type f 처럼 심볼릭 링크는 건너뛴다. (링크를 변환한 사본으로 바꾸지 않도록)"""
+    for p in paths:
+        if os.path.islink(p):
+            continue
+        if os.path.isfile(p):
+            yield p
+            continue
+        for root, _dirs, files in os.walk(p):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.islink(path):
+                    continue
+                if pattern is None or fnmatch.fnmatch(name, pattern):
+                    yield path
+
+
+def convert_tree(paths, reverse=False, backup=True, pattern=None, jobs=None, quiet=False):
+    """:return: {OK: n, SKIP: n, FAIL: n}"""
+    files = list(walk_files(paths, pattern))
+    stat = {OK: 0, SKIP: 0, FAIL: 0}
+    work = [(f, reverse, backup) for f in files]
+    if jobs == 1:
+        results = map(_convert_file, work)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(_convert_file, work, chunksize=max(1, len(work) // (64 * (jobs or os.cpu_count() or 1))))
+    try:
+        for path, st, msg in results:
+            stat[st] += 1
+            if not quiet and st != SKIP:
+                print(paint(path, msg, st == OK))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stat
+
+
+def bench(src, reverse=False, jobs=None):
+    """src 를 두 번 복사해서 쉘 파이프라인과 이 스크립트의 처리 시간을 비교한다."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(here, 'u82kr' if reverse else 'kr2u8')
+    with tempfile.TemporaryDirectory(prefix='kr2u8-bench-') as tmp:
+        a = os.path.join(tmp, 'shell')
+        b = os.path.join(tmp, 'python')
+        shutil.copytree(src, a, symlinks=True)
+        shutil.copytree(src, b, symlinks=True)
+        nfiles = sum(1 for _ in walk_files([b]))
+
+        start = time.perf_counter()
+        subprocess.run(['find', a, '-type', 'f', '-exec', script, '{}', ';'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        t_shell = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert_tree([b], reverse=reverse, jobs=jobs, quiet=True)
+        t_py = time.perf_counter() - start
+
+    print("==================================================")
+    print(f"  files  : {nfiles}")
+    print(f"  shell  : {t_shell:8.3f}s  ({nfiles / t_shell:10.1f} files/s)")
+    print(f"  python : {t_py:8.3f}s  ({nfiles / t_py:10.1f} files/s)")
+    print(f"  speedup: {t_shell / t_py:8.1f}x")
+    print("==================================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EUC-KR(UHC) <-> UTF-8 변환 (kr2u8/u82kr)')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='파일 또는 디렉토리')
+    parser.add_argument('-R', '--reverse', action='store_true', help='UTF-8 -> UHC (u82kr)')
+    parser.add_argument('-f', '--filenames', action='store_true', help='내용 대신 파일/디렉토리 이름을 변환 (kr2u8fR)')
+    parser.add_argument('-n', '--name', metavar='GLOB', help='이 패턴의 파일만 변환 (예: "*.cpp")')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='동시에 변환할 프로세스 수')
+    parser.add_argument('--no-backup', dest='backup', action='store_false', help='.bak 파일을 남기지 않음')
+    parser.add_argument('--bench', action='store_true', help='PATH 복사본으로 기존 쉘 스크립트와 속도 비교')
+    args = parser.parse_args()
+
+    if args.bench:
+        for p in args.paths:
+            bench(p, args.reverse, args.jobs)
+        return 0
+
+    if args.filenames:
+        for p in args.paths:
+            rename_tree(p, args.reverse)
+        return 0
+
+    stat = convert_tree(args.paths, args.reverse, args.backup, args.name, args.jobs)
+    print(f"converted {stat[OK]}, failed {stat[FAIL]}, unchanged {stat[SKIP]}")
+    return 1 if stat[FAIL] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,27 +1,106 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python3
 #-*- coding: utf-8 -*-
+#
+# '\Uc11c\Ubc84\Uc5d0 \Ubb38\Uc81c...' 처럼 이스케이프된 문자열을 UTF-8 로 바꾼다.
+#
+# -s 로 실행하면 stdin 이나 파일을 CHUNK_SIZE 씩 읽으면서 \uXXXX, \UXXXX,
+# \UXXXXXXXX 만 바꾸고 나머지는 그대로 출력하므로 큰 로그도 메모리를 일정하게 쓴다.
+#
+import argparse
+import re
 import sys
-reload(sys)
-sys.setdefaultencoding('utf-8')
 
-if len(sys.argv) > 1:
-    foo = sys.argv[1].lower()
-    print(foo.decode('unicode_escape').encode('utf-8'))
-    exit(1)
-#print("Usage:\n" + sys.argv[0] + "'\Uc11c\Ubc84\Uc5d0 \Ubb38\Uc81c\Uac00 \Ubc1c\Uc0dd\Ud588\Uc2b5\Ub2c8\Ub2e4.'")
-exit(1)
+CHUNK_SIZE = 1 << 20
 
-foo = '\Uc11c\Ubc84\Uc5d0 \Ubb38\Uc81c\Uac00 \Ubc1c\Uc0dd\Ud588\Uc2b5\Ub2c8\Ub2e4.'
-print(foo)
-# foo = foo.decode('raw_unicode_escape')
+# 가장 긴 이스케이프는 서로게이트 쌍 '\ud83d\ude00' (12 글자)
+MAX_ESCAPE = 12
 
-foo = foo.lower() # replace('\U', '\u')
-print(foo)
+ESCAPE_RE = re.compile(
+    r'\\[uU]([dD][89abAB][0-9a-fA-F]{2})\\[uU]([dD][c-fC-F][0-9a-fA-F]{2})'  # 서로게이트 쌍
+    r'|\\U(0010[0-9a-fA-F]{4}|000[0-9a-fA-F]{5})'                            # \UXXXXXXXX
+    r'|\\[uU]((?![dD][89a-fA-F])[0-9a-fA-F]{4})'                             # \uXXXX, \UXXXX
+)
 
-foo = foo.decode('unicode_escape')
-print(type(foo))
+_memo = {}
 
-foo = foo.encode('utf-8')
-print(type(foo))
-print(foo)
 
+def _sub(m):
+    key = m.group(0)
+    ch = _memo.get(key)
+    if ch is None:
+        high, low, wide, narrow = m.groups()
+        if high is not None:
+            ch = chr(0x10000 + ((int(high, 16) - 0xd800) << 10) + (int(low, 16) - 0xdc00))
+        else:
+            ch = chr(int(wide or narrow, 16))
+        if len(_memo) < 65536:
+            _memo[key] = ch
+    return ch
+
+
+def decode(text):
+    return ESCAPE_RE.sub(_sub, text)
+
+
+def decode_partial(buf):
+    """
+    buf 의 마지막 MAX_ESCAPE 글자 안에서 시작하는 이스케이프는 잘렸을 수 있으므로
+    그 앞까지만 바꾼다. :return: (바꾼 문자열, 다음 청크 앞에 붙일 나머지)
+    """
+    cut = len(buf) - MAX_ESCAPE
+    if cut <= 0:
+        return '', buf
+    out = []
+    pos = 0
+    for m in ESCAPE_RE.finditer(buf):
+        if m.end() > cut:
+            cut = m.start()
+            break
+        out.append(buf[pos:m.start()])
+        out.append(_sub(m))
+        pos = m.end()
+    out.append(buf[pos:cut])
+    return ''.join(out), buf[cut:]
+
+
+def stream(files):
+    write = sys.stdout.write
+    for name in files or ['-']:
+        f = sys.stdin if name == '-' else open(name, encoding='utf-8', errors='surrogateescape')
+        try:
+            carry = ''
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    write(decode(carry))
+                    break
+                out, carry = decode_partial(carry + chunk)
+                write(out)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s '\\Uc11c\\Ubc84\\Uc5d0 \\Ubb38\\Uc81c\\Uac00 \\Ubc1c\\Uc0dd\\Ud588\\Uc2b5\\Ub2c8\\Ub2e4.'\n"
+              "       %(prog)s -s [FILE ...]")
+    parser.add_argument('-s', '--stream', action='store_true', help='stdin 이나 FILE 을 읽어서 바꿔 출력')
+    parser.add_argument('args', nargs='*', metavar='STRING|FILE')
+    args = parser.parse_args()
+
+    if args.stream:
+        sys.stdin.reconfigure(errors='surrogateescape')
+        sys.stdout.reconfigure(errors='surrogateescape')
+        stream(args.args)
+        return 0
+    if not args.args:
+        parser.print_usage()
+        return 1
+    for s in args.args:
+        print(decode(s))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
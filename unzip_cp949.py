@@ -1,25 +1,120 @@
-#! /usr/bin/env python
+#! /usr/bin/env python3
 # -*- coding: utf-8 -*-
+#
+# cp949(한글 윈도우) 파일명으로 압축된 zip 을 푼다.
+#
+# 멤버들은 크기 기준으로 나눠서 여러 프로세스가 각자 ZipFile 을 열고 풀며,
+# 각 멤버는 CHUNK_SIZE 씩 읽어서 쓰므로 큰 파일도 메모리를 많이 쓰지 않는다.
+#
+# -u 로 실행하면 이미 풀려 있는 파일과 크기(먼저), CRC32(크기가 같을 때만) 를
+# 비교해서 새로 생겼거나 바뀐 멤버만 다시 푼다.
+#
 
-import sys, os, zipfile
+import os, time, shutil, zipfile, zlib, argparse
+from concurrent.futures import ProcessPoolExecutor
 
-def unzip(file, dir):
+CHUNK_SIZE = 1 << 20
+
+def member_name(info):
+	"""UTF-8 플래그가 없으면 zipfile 이 cp437 로 읽은 이름을 cp949 로 다시 읽는다."""
+	if info.flag_bits & 0x800:
+		return info.filename
+	try:
+		return info.filename.encode('cp437').decode('cp949')
+	except (UnicodeEncodeError, UnicodeDecodeError):
+		return info.filename
+
+def target_path(name, dir):
+	"""zipfile.extract 와 같이 절대경로와 '..' 를 제거한 경로."""
+	parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+	return os.path.join(dir or '.', *parts)
+
+def file_crc32(path):
+	crc = 0
+	with open(path, 'rb') as f:
+		while True:
+			buf = f.read(CHUNK_SIZE)
+			if not buf:
+				return crc
+			crc = zlib.crc32(buf, crc)
+
+def is_unchanged(path, info):
+	"""이미 풀린 파일이 멤버와 같은지. 크기가 다르면 CRC 는 계산하지 않는다."""
+	try:
+		if os.path.getsize(path) != info.file_size:
+			return False
+	except OSError:
+		return False
+	return file_crc32(path) == info.CRC
+
+def extract_members(file, dir, members, update=False):
+	"""members [(index, name), ...] 를 풀고 (푼 바이트 수, 푼 이름 목록) 을 반환한다."""
+	total = 0
+	written = []
+	with zipfile.ZipFile(file) as zfobj:
+		infos = zfobj.infolist()
+		for index, name in members:
+			path = target_path(name, dir)
+			if update and is_unchanged(path, infos[index]):
+				continue
+			os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+			with zfobj.open(infos[index]) as src, open(path, 'wb') as dst:
+				shutil.copyfileobj(src, dst, CHUNK_SIZE)
+			total += infos[index].file_size
+			written.append(name)
+	return total, written
+
+def split_members(infos, jobs):
+	"""큰 멤버부터 가장 덜 찬 묶음에 넣어서 jobs 개로 나눈다."""
+	buckets = [[] for _ in range(jobs)]
+	sizes = [0] * jobs
+	for index, name, info in sorted(infos, key=lambda x: x[2].file_size, reverse=True):
+		i = sizes.index(min(sizes))
+		buckets[i].append((index, name))
+		sizes[i] += info.file_size
+	return [b for b in buckets if b]
+
+def unzip(file, dir, jobs=None, update=False):
 	if dir is not None:
-		os.mkdir(dir)
+		os.makedirs(dir, exist_ok=True)
+
+	start = time.monotonic()
+	with zipfile.ZipFile(file) as zfobj:
+		members = []
+		for index, info in enumerate(zfobj.infolist()):
+			name = member_name(info)
+			if info.is_dir():
+				os.makedirs(target_path(name, dir), exist_ok=True)
+			else:
+				members.append((index, name, info))
 
-	zfobj = zipfile.ZipFile(file)
-	for info in zfobj.infolist():
-		info.filename =  info.filename.decode('cp949').encode('utf-8')
-		zfobj.extract(info, dir)
+	jobs = jobs or os.cpu_count() or 1
+	total = 0
+	count = 0
+	if jobs == 1:
+		results = [extract_members(file, dir, [(i, n) for i, n, _ in members], update)]
+	else:
+		with ProcessPoolExecutor(max_workers=jobs) as pool:
+			futures = [pool.submit(extract_members, file, dir, b, update)
+			           for b in split_members(members, jobs)]
+			results = [f.result() for f in futures]
+	for size, written in results:
+		total += size
+		count += len(written)
+		for name in written:
+			print(name)
+	elapsed = time.monotonic() - start
 
-		print(info.filename)
+	rate = total / elapsed / (1 << 20) if elapsed > 0 else 0.0
+	print('{0} files, {1} bytes in {2:.2f}s ({3:.1f} MB/s)'.format(count, total, elapsed, rate))
+	if update:
+		print('{0} unchanged'.format(len(members) - count))
 
 if __name__ == '__main__':
-	argc = len(sys.argv)
-
-	if argc == 1:
-		print('Usage: {0} file [exdir]'.format(sys.argv[0]))
-	elif argc == 2:
-		unzip(sys.argv[1], None)
-	elif argc == 3:
-		unzip(sys.argv[1], sys.argv[2])
+	parser = argparse.ArgumentParser(usage='%(prog)s [-j N] [-u] file [exdir]')
+	parser.add_argument('file')
+	parser.add_argument('exdir', nargs='?')
+	parser.add_argument('-j', '--jobs', type=int, default=None, help='동시에 푸는 프로세스 수')
+	parser.add_argument('-u', '--update', action='store_true', help='새로 생기거나 바뀐 멤버만 푼다')
+	args = parser.parse_args()
+	unzip(args.file, args.exdir, args.jobs, args.update)
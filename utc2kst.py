@@ -1,18 +1,30 @@
-#!/usr/bin/env python
-# 
+#!/usr/bin/env python3
+#
 # https://stackoverflow.com/questions/4770297/convert-utc-datetime-string-to-local-datetime-with-python#4771733
-# 
+#
+# -s 로 실행하면 stdin 이나 파일을 한 줄씩 읽어서 줄 안의 모든
+# 'YYYY-MM-DD HH:MM:SS' (또는 'T' 구분) 타임스탬프를 로컬 시간으로 바꿔 출력한다.
+# 고정 포맷은 strptime 대신 문자열을 잘라서 읽고, UTC -> 로컬 오프셋은
+# 하루 단위로 캐시해서 DST 가 바뀌는 날에만 15분 단위로 다시 계산한다.
+#
+# -i 로 실행하면 FILE 들을 줄바꿈 기준 청크로 나눠 프로세스 풀에서 mmap 으로
+# 읽어 바꾸고, 같은 디렉토리의 임시 파일에 쓴 뒤 원본과 교체한다.
+# FILE 이 심볼릭 링크면 링크가 아니라 링크가 가리키는 실제 파일을 바꾼다.
+# --format 으로 strptime 포맷을, --regex 로 찾을 패턴을 줄 수 있다.
+# (--regex 에 (?P<ts>...) 그룹이 있으면 그 부분만 바꾼다.)
+#
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil import tz
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import mmap
+import os
+import re
+import shutil
 import sys
-
-def usage():
-    print("Usage:\n% {} 2011-01-21\ 02:37:21".format(sys.argv[0]))
-
-if len(sys.argv) != 2:
-    usage()
-    exit(0)
+import tempfile
+import time
 
 # METHOD 1: Hardcode zones:
 # from_zone = tz.gettz('UTC')
@@ -22,15 +34,316 @@ if len(sys.argv) != 2:
 from_zone = tz.tzutc()
 to_zone = tz.tzlocal()
 
-# utc = datetime.utcnow()
-utc = sys.argv[1]
-utc = utc[:10] + ' ' + utc[11:] # support '2011-01-21T02:37:21' format
-utc = datetime.strptime(utc, '%Y-%m-%d %H:%M:%S')
+# \d 는 전각 숫자 같은 유니코드 숫자도 받으므로 ASCII 숫자만 찾는다.
+TIMESTAMP_RE = re.compile(r'([0-9]{4})-([0-9]{2})-([0-9]{2})([ T])([0-9]{2}):([0-9]{2}):([0-9]{2})')
+
+DAY = 86400
+QUARTER = 900  # 모든 타임존의 오프셋/전환 시각은 15분 단위
+
+# -i 에서 프로세스 하나가 맡는 크기
+CHUNK_SIZE = 8 << 20
+
+# strptime 지시자 -> 정규식 (strptime 이 읽을 수 있는 것만)
+FORMAT_RE = {
+    'Y': '[0-9]{4}', 'y': '[0-9]{2}', 'm': '[0-9]{2}', 'd': '[0-9]{2}', 'H': '[0-9]{2}',
+    'I': '[0-9]{2}', 'M': '[0-9]{2}', 'S': '[0-9]{2}', 'f': '[0-9]{1,6}', 'j': '[0-9]{3}',
+    'b': r'[A-Za-z]{3}', 'a': r'[A-Za-z]{3}', 'p': r'[AP]M', '%': '%',
+}
+
+
+def format_fields(fmt):
+    """
+    strptime 포맷을 (정규식, 지시자 목록) 으로. 정규식의 n 번째 그룹 'fN' 이 n 번째 지시자다.
+    """
+    out = []
+    fields = []
+    i = 0
+    while i < len(fmt):
+        if fmt[i] == '%' and i + 1 < len(fmt):
+            c = fmt[i + 1]
+            if c not in FORMAT_RE:
+                raise ValueError("unsupported directive '%%%s' in '%s'" % (c, fmt))
+            if c == '%':
+                out.append('%')
+            else:
+                out.append('(?P<f%d>%s)' % (len(fields), FORMAT_RE[c]))
+                fields.append(c)
+            i += 2
+        else:
+            out.append(re.escape(fmt[i]))
+            i += 1
+    return ''.join(out), fields
+
+
+def format_regex(fmt):
+    """strptime 포맷에 맞는 문자열을 찾는 정규식"""
+    return re.sub(r'\(\?P<f\d+>', '(?:', format_fields(fmt)[0])
+
+
+def days_from_civil(y, m, d):
+    """1970-01-01 부터의 일 수 (proleptic Gregorian)"""
+    y -= m <= 2
+    era = (y if y >= 0 else y - 399) // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def days_in_month(y, m):
+    if m == 2:
+        return 29 if y % 4 == 0 and (y % 100 != 0 or y % 400 == 0) else 28
+    return 30 if m in (4, 6, 9, 11) else 31
+
+
+def civil_from_days(z):
+    """days_from_civil 의 역함수 -> (y, m, d)"""
+    z += 719468
+    era = (z if z >= 0 else z - 146096) // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    y = yoe + era * 400
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + (3 if mp < 10 else -9)
+    return y + (m <= 2), m, d
+
+
+class OffsetCache:
+    """UTC epoch 초 -> 로컬 오프셋(초). 오프셋이 하루 종일 같으면 그 날은 한 번만 계산한다."""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.days = {}
+        self.quarters = {}
+
+    def _offset(self, t):
+        y, m, d = civil_from_days(t // DAY)
+        s = t % DAY
+        utc = datetime(y, m, d, s // 3600, s // 60 % 60, s % 60, tzinfo=from_zone)
+        return int(utc.astimezone(self.zone).utcoffset().total_seconds())
+
+    def __call__(self, t):
+        day = t // DAY
+        off = self.days.get(day, False)
+        if off is False:
+            first = self._offset(day * DAY)
+            last = self._offset(day * DAY + DAY - 1)
+            off = self.days[day] = first if first == last else None
+        if off is not None:
+            return off
+        q = t // QUARTER
+        off = self.quarters.get(q)
+        if off is None:
+            off = self.quarters[q] = self._offset(q * QUARTER)
+        return off
+
+
+class Converter:
+    """줄 안의 타임스탬프를 로컬 시간으로 바꾼다."""
+
+    MEMO_SIZE = 1 << 16
+
+    def __init__(self, zone=to_zone, regex=None, fmt=None):
+        self.offset = OffsetCache(zone)
+        self.memo = {}
+        if regex is None and fmt is None:
+            self.regex = TIMESTAMP_RE
+            self._convert = self._convert_fixed
+        else:
+            self.fmt = fmt or '%Y-%m-%d %H:%M:%S'
+            fields_re, self.fields = format_fields(self.fmt)
+            self.fields_re = re.compile(fields_re + r'\Z')
+            # strptime 이 못 읽는 포맷은 아무것도 바꾸지 못하므로 미리 거른다.
+            sample = datetime(2001, 2, 3, 4, 5, 6, 789000)
+            datetime.strptime(sample.strftime(self.fmt), self.fmt)
+            self.regex = re.compile(regex or format_regex(self.fmt))
+            self.has_ts = 'ts' in self.regex.groupindex
+            self._convert = self._convert_format
+
+    def _sub(self, m):
+        # 로그에는 같은 초가 연달아 나오므로 바꾼 결과를 기억해 둔다.
+        key = m.group(0)
+        out = self.memo.get(key)
+        if out is None:
+            if len(self.memo) >= self.MEMO_SIZE:
+                self.memo.clear()
+            out = self.memo[key] = self._convert(m)
+        return out
+
+    def _convert_fixed(self, m):
+        y, mo, d, sep, h, mi, s = m.groups()
+        y, mo, d, h, mi, s = int(y), int(mo), int(d), int(h), int(mi), int(s)
+        # '0000-00-00 00:00:00' 같은 값이나 없는 날짜는 그대로 둔다.
+        if not (1 <= mo <= 12 and 1 <= d <= days_in_month(y, mo) and h < 24 and mi < 60 and s < 60):
+            return m.group(0)
+        t = days_from_civil(y, mo, d) * DAY + h * 3600 + mi * 60 + s
+        try:
+            t += self.offset(t)
+        except (ValueError, OverflowError):
+            # datetime 범위(1~9999년)를 벗어나면 변환하지 않는다.
+            return m.group(0)
+        y, mo, d = civil_from_days(t // DAY)
+        s = t % DAY
+        return '%04d-%02d-%02d%s%02d:%02d:%02d' % (y, mo, d, sep, s // 3600, s // 60 % 60, s % 60)
+
+    def _convert_format(self, m):
+        text = m.group('ts') if self.has_ts else m.group(0)
+        # ts 가 선택/대안 그룹이면 매치에 참여하지 않았을 수 있다.
+        if text is None:
+            return m.group(0)
+        fm = self.fields_re.match(text)
+        if fm is None:
+            return m.group(0)
+        try:
+            dt = datetime.strptime(text, self.fmt)
+            t = days_from_civil(dt.year, dt.month, dt.day) * DAY + dt.hour * 3600 + dt.minute * 60 + dt.second
+            local = dt + timedelta(seconds=self.offset(t))
+        except (ValueError, OverflowError):
+            return m.group(0)
+        # strftime(self.fmt) 는 '%f' 를 6자리로 늘리므로 날짜/시간 필드만 다시 쓰고
+        # 초 이하 부분은 원래 글자 그대로 둔다.
+        parts = []
+        pos = 0
+        for n, c in enumerate(self.fields):
+            start, end = fm.span('f%d' % n)
+            parts.append(text[pos:start])
+            parts.append(text[start:end] if c == 'f' else local.strftime('%' + c))
+            pos = end
+        parts.append(text[pos:])
+        out = ''.join(parts)
+        if not self.has_ts:
+            return out
+        whole = m.group(0)
+        start, end = m.span('ts')
+        return whole[:start - m.start()] + out + whole[end - m.start():]
+
+    def line(self, line):
+        return self.regex.sub(self._sub, line)
+
+
+_worker_conv = None
+
+
+def _init_worker(regex, fmt):
+    global _worker_conv
+    _worker_conv = Converter(to_zone, regex, fmt)
+
+
+def _convert_chunk(path, start, end):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = str(mm[start:end], 'utf-8', 'surrogateescape')
+    return _worker_conv.line(text).encode('utf-8', 'surrogateescape')
+
+
+def chunk_bounds(path, size):
+    """파일을 size 근처에서 줄바꿈 다음으로 자른 (start, end) 목록"""
+    bounds = []
+    with open(path, 'rb') as f:
+        length = os.fstat(f.fileno()).st_size
+        if length == 0:
+            return bounds
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while start < length:
+                nl = mm.find(b'\n', min(start + size, length) - 1)
+                end = length if nl < 0 else nl + 1
+                bounds.append((start, end))
+                start = end
+    return bounds
+
+
+def rewrite(paths, regex=None, fmt=None, jobs=None, chunk_size=CHUNK_SIZE):
+    """paths 의 타임스탬프를 바꿔서 원본을 교체한다."""
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(regex, fmt)) as pool:
+        for name in paths:
+            start = time.monotonic()
+            # 링크 경로에 os.replace 하면 링크가 일반 파일로 바뀌므로 실제 경로를 쓴다.
+            path = os.path.realpath(name)
+            bounds = chunk_bounds(path, chunk_size)
+            fd, tmp = tempfile.mkstemp(prefix='.utc2kst-', dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    # 결과가 메모리에 쌓이지 않도록 jobs * 2 개씩만 돌린다.
+                    window = jobs * 2
+                    for i in range(0, len(bounds), window):
+                        futures = [pool.submit(_convert_chunk, path, s, e) for s, e in bounds[i:i + window]]
+                        for fut in futures:
+                            out.write(fut.result())
+                shutil.copymode(path, tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            elapsed = time.monotonic() - start
+            size = bounds[-1][1] if bounds else 0
+            rate = size / elapsed / (1 << 20) if elapsed > 0 else 0.0
+            print('%s : %d bytes, %d chunks in %.2fs (%.1f MB/s)' % (name, size, len(bounds), elapsed, rate),
+                  file=sys.stderr)
+
+
+def stream(files, regex=None, fmt=None):
+    conv = Converter(to_zone, regex, fmt)
+    write = sys.stdout.write
+    for name in files or ['-']:
+        f = sys.stdin if name == '-' else open(name, encoding='utf-8', errors='surrogateescape')
+        try:
+            for line in f:
+                write(conv.line(line))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def convert_one(utc):
+    # utc = datetime.utcnow()
+    utc = utc[:10] + ' ' + utc[11:] # support '2011-01-21T02:37:21' format
+    utc = datetime.strptime(utc, '%Y-%m-%d %H:%M:%S')
+
+    # Tell the datetime object that it's in UTC time zone since
+    # datetime objects are 'naive' by default
+    utc = utc.replace(tzinfo=from_zone)
+
+    # Convert time zone
+    kst = utc.astimezone(to_zone)
+    print(kst)
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='%(prog)s 2011-01-21\\ 02:37:21\n'
+                                           '       %(prog)s -s [--format FMT] [--regex RE] [FILE ...]\n'
+                                           '       %(prog)s -i [--format FMT] [--regex RE] [-j N] FILE ...')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('-s', '--stream', action='store_true',
+                      help='stdin 이나 FILE 의 모든 줄에서 타임스탬프를 바꿔 출력')
+    mode.add_argument('-i', '--in-place', action='store_true',
+                      help='FILE 안의 타임스탬프를 바꿔서 파일을 교체')
+    parser.add_argument('--format', help="타임스탬프 strptime 포맷 (예: '%%d/%%b/%%Y:%%H:%%M:%%S')")
+    parser.add_argument('--regex', help='타임스탬프를 찾을 정규식, (?P<ts>...) 가 있으면 그 그룹만 바꾼다')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='-i 에서 사용할 프로세스 수')
+    parser.add_argument('args', nargs='*', metavar='TIMESTAMP|FILE')
+    args = parser.parse_args()
+
+    try:
+        Converter(to_zone, args.regex, args.format)
+    except (ValueError, re.error) as e:
+        parser.error(str(e))
+
+    if args.in_place:
+        if not args.args:
+            parser.error('-i needs FILE')
+        rewrite(args.args, args.regex, args.format, args.jobs)
+    elif args.stream:
+        sys.stdin.reconfigure(errors='surrogateescape')
+        sys.stdout.reconfigure(errors='surrogateescape')
+        stream(args.args, args.regex, args.format)
+    elif len(args.args) == 1:
+        convert_one(args.args[0])
+    else:
+        parser.print_usage()
 
-# Tell the datetime object that it's in UTC time zone since 
-# datetime objects are 'naive' by default
-utc = utc.replace(tzinfo=from_zone)
 
-# Convert time zone
-kst = utc.astimezone(to_zone)
-print(kst)
+if __name__ == '__main__':
+    main()
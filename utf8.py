@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 #
 # author : Doo-Hyun Jang <ring0320@skcomms.co.kr>
@@ -7,75 +7,343 @@
 # This script make "UTF8" sub directory for UTF-8 encoding.
 # It is only changing name with UTF-8, contents is not changing.
 #
+# The tree is walked once to build a work list, then the files are copied
+# by a thread pool. Each copy tries reflink (FICLONE), copy_file_range and
+# sendfile in that order so the data never passes through userspace.
+#
+# With --sync, a manifest (UTF8/.utf8-manifest.json) of
+# source path -> (size, mtime, converted name) is kept so that only new or
+# changed files are copied and mirrors of deleted sources are removed.
+#
+# Since only names change, --link makes the mirror with hardlinks instead of
+# copies, and --rename converts the names in place, recording every rename
+# in a journal that --undo can replay backwards.
+#
 
 import os
 import os.path
-import commands
 import sys
-import string
 import shutil
 import errno
+import time
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 current_path=os.getcwd()
-utf8_path=""
 copy_path="UTF8"
 cvs_path="CVS"
+manifest_file=".utf8-manifest.json"
+
+self_file=os.path.basename(sys.argv[0]) or "utf8.py"
 
-# TODO : 현재 스크립트명
-# self_file=sys.argv[0]
-# print "XXXXXX" + self_file
-self_file="utf8.py"
+# linux/fs.h : _IOW(0x94, 9, int)
+FICLONE=0x40049409
 
-def dirlist(_dir):
-	global utf8_path
-	global copy_path
-	global cvs_path
-	global self_file
+# copy_file_range/sendfile 한번에 넘기는 최대 크기
+CHUNK_SIZE=1 << 30
 
+def to_utf8(name):
+	"""EUC-KR 이름을 UTF-8 로 바꾼다. EUC-KR 이 아니면 그대로 둔다."""
 	try:
-		_dir.decode('EUC-KR')
+		return name.decode('EUC-KR').encode('UTF-8')
 	except UnicodeDecodeError:
-		root_utf8=_dir
-	else:
-		root_utf8=_dir.decode('EUC-KR').encode('UTF-8')
+		return name
+
+def dirlist(_dir, _dest, dirs, files):
+	"""_dir 를 돌면서 만들 디렉토리와 복사할 (src, dest) 목록을 채운다."""
 	for a_dir in os.listdir(_dir):
 		# TODO : 예외를 배열로 처리할 수 있음.
-		if a_dir == cvs_path:
-			continue
-		if a_dir == copy_path:
-			continue
-		if a_dir == self_file:
+		name=os.fsdecode(a_dir)
+		if name in (cvs_path, copy_path, self_file):
 			continue
 
-		try:
-			a_dir.decode('EUC-KR')
-		except UnicodeDecodeError:
-			a_utf8=a_dir
-		else:
-			a_utf8=a_dir.decode('EUC-KR').encode('UTF-8')
-			
-			
 		src_file=os.path.join(_dir, a_dir)
-		utf8_path=os.path.join(root_utf8, a_utf8)
-		if os.path.isdir(src_file) :
-			print "DIR : " + utf8_path
-			try:
-				os.makedirs(string.replace(utf8_path,"/doc/", "/doc/UTF8/"))
-			except OSError as exc:
-				if exc.errno == errno.EEXIST:
-					pass
-				else:
-					raise
-			dirlist(src_file)
+		dest_file=os.path.join(_dest, to_utf8(a_dir))
+		if os.path.isdir(src_file) and not os.path.islink(src_file):
+			dirs.append(dest_file)
+			dirlist(src_file, dest_file, dirs, files)
+		elif os.path.isfile(src_file):
+			files.append((src_file, dest_file))
+		else:
+			print(">>> SKIP FILE : %s" % os.fsdecode(dest_file))
+
+def _reflink(fsrc, fdst):
+	try:
+		import fcntl
+	except ImportError:
+		return False
+	try:
+		fcntl.ioctl(fdst, FICLONE, fsrc)
+	except OSError:
+		return False
+	return True
+
+def _copy_range(fsrc, fdst, size):
+	"""copy_file_range 로 복사한다. 지원하지 않으면 False."""
+	if not hasattr(os, "copy_file_range"):
+		return False
+	offset=0
+	try:
+		while offset < size:
+			n=os.copy_file_range(fsrc, fdst, min(CHUNK_SIZE, size - offset))
+			if n == 0:
+				break
+			offset+=n
+	except OSError as exc:
+		if offset == 0 and exc.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+		                                 errno.EOPNOTSUPP, errno.EBADF, errno.EPERM):
+			return False
+		raise
+	return True
+
+def _sendfile(fsrc, fdst, size):
+	"""sendfile 로 복사한다. 지원하지 않으면 False."""
+	if not hasattr(os, "sendfile"):
+		return False
+	offset=0
+	try:
+		while offset < size:
+			n=os.sendfile(fdst, fsrc, offset, min(CHUNK_SIZE, size - offset))
+			if n == 0:
+				break
+			offset+=n
+	except OSError as exc:
+		if offset == 0 and exc.errno in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK,
+		                                 errno.EOPNOTSUPP):
+			return False
+		raise
+	return True
+
+def copy_file(src, dest):
+	"""src 를 dest 로 복사하고 복사한 바이트 수를 반환한다. (shutil.copy 와 같이 mode 도 복사)"""
+	with open(src, 'rb') as fs, open(dest, 'wb') as fd:
+		fsrc=fs.fileno()
+		fdst=fd.fileno()
+		size=os.fstat(fsrc).st_size
+		if not (_reflink(fsrc, fdst)
+		        or _copy_range(fsrc, fdst, size)
+		        or _sendfile(fsrc, fdst, size)):
+			shutil.copyfileobj(fs, fd)
+	shutil.copymode(src, dest)
+	return size
+
+def makedirs(path):
+	try:
+		os.makedirs(path)
+	except OSError as exc:
+		if exc.errno == errno.EEXIST:
+			pass
 		else:
-			# TODO : 문서파일이면 으로 한정.
-                        #if os.path.isfile(a_dir) :
-                        #	print "FILE : " + a_utf8
-			dest_file="%s/%s" % (string.replace(root_utf8,"/doc/", "/doc/UTF8/"), a_utf8)
-			if os.path.isfile(src_file):
-				print "COPY FILE : %s" % (dest_file)
-				shutil.copy(src_file, dest_file)
-			else:
-				print ">>> SKIP FILE : %s" % (dest_file)
-
-dirlist(current_path)
+			raise
+
+def unlink_dest(dest):
+	"""dest 가 원본의 hardlink 일 수 있으므로 덮어쓰기 전에 지운다."""
+	try:
+		os.unlink(dest)
+	except FileNotFoundError:
+		pass
+
+def copy_one(src, dest):
+	unlink_dest(dest)
+	size=copy_file(src, dest)
+	print("COPY FILE : %s" % os.fsdecode(dest))
+	return size
+
+def link_one(src, dest):
+	unlink_dest(dest)
+	try:
+		os.link(src, dest)
+	except OSError as exc:
+		if exc.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+			return copy_one(src, dest)
+		raise
+	print("LINK FILE : %s" % os.fsdecode(dest))
+	return 0
+
+def load_manifest(path):
+	"""manifest 를 읽는다. 없거나 깨져 있으면 빈 manifest."""
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			data=json.load(f)
+	except FileNotFoundError:
+		return {"files": {}, "dirs": []}
+	except ValueError:
+		print(">>> BROKEN MANIFEST, FULL COPY : %s" % os.fsdecode(path))
+		return {"files": {}, "dirs": []}
+	data.setdefault("files", {})
+	data.setdefault("dirs", [])
+	return data
+
+def save_manifest(path, data):
+	tmp=path + b".tmp"
+	with open(tmp, 'w', encoding='utf-8') as f:
+		json.dump(data, f)
+	os.replace(tmp, path)
+
+def remove_file(path):
+	try:
+		os.unlink(path)
+	except FileNotFoundError:
+		return False
+	print("REMOVE FILE : %s" % os.fsdecode(path))
+	return True
+
+def remove_dir(path):
+	try:
+		os.rmdir(path)
+	except OSError as exc:
+		if exc.errno in (errno.ENOENT, errno.ENOTEMPTY, errno.EEXIST):
+			return False
+		raise
+	print("REMOVE DIR : %s" % os.fsdecode(path))
+	return True
+
+def plan_sync(top, dest_top, dirs, files):
+	"""manifest 와 비교해서 복사할 파일, 지울 파일/디렉토리, 새 manifest 를 만든다."""
+	old=load_manifest(os.path.join(dest_top, os.fsencode(manifest_file)))
+	old_files=old["files"]
+	new_files={}
+	todo=[]
+	for src, dest in files:
+		st=os.stat(src)
+		key=os.fsdecode(os.path.relpath(src, top))
+		entry=[st.st_size, st.st_mtime_ns, os.fsdecode(os.path.relpath(dest, dest_top))]
+		new_files[key]=entry
+		if old_files.get(key) != entry or not os.path.exists(dest):
+			todo.append((src, dest))
+
+	new_dests=set(e[2] for e in new_files.values())
+	stale=[os.path.join(dest_top, os.fsencode(e[2]))
+	       for e in old_files.values() if e[2] not in new_dests]
+
+	new_dirs=[os.fsdecode(os.path.relpath(d, dest_top)) for d in dirs]
+	gone=set(old["dirs"]) - set(new_dirs)
+	stale_dirs=[os.path.join(dest_top, os.fsencode(d))
+	            for d in sorted(gone, key=len, reverse=True)]
+	return todo, stale, stale_dirs, {"files": new_files, "dirs": new_dirs}
+
+def run(top, jobs, sync=False, link=False):
+	top=os.fsencode(top)
+	dest_top=os.path.join(top, os.fsencode(copy_path))
+	dirs=[]
+	files=[]
+	dirlist(top, dest_top, dirs, files)
+
+	removed=0
+	if sync:
+		todo, stale, stale_dirs, manifest=plan_sync(top, dest_top, dirs, files)
+		for path in stale:
+			removed+=remove_file(path)
+		for path in stale_dirs:
+			remove_dir(path)
+	else:
+		todo=files
+
+	makedirs(dest_top)
+	for d in dirs:
+		if not os.path.isdir(d):
+			print("DIR : " + os.fsdecode(d))
+			makedirs(d)
+
+	one=link_one if link else copy_one
+	start=time.monotonic()
+	total=0
+	with ThreadPoolExecutor(max_workers=jobs) as pool:
+		for size in pool.map(lambda f: one(*f), todo):
+			total+=size
+	elapsed=time.monotonic() - start
+
+	if sync:
+		save_manifest(os.path.join(dest_top, os.fsencode(manifest_file)), manifest)
+
+	rate=total / elapsed / (1 << 20) if elapsed > 0 else 0.0
+	print("==================================================")
+	print("  %d dirs, %d files, %d bytes in %.2fs (%.1f MB/s)"
+	      % (len(dirs), len(todo), total, elapsed, rate))
+	if sync:
+		print("  %d unchanged, %d removed" % (len(files) - len(todo), removed))
+	print("==================================================")
+
+def rename_tree(top, journal):
+	"""top 아래 이름을 제자리에서 UTF-8 로 바꾸고 journal 에 (src, dest) 를 남긴다."""
+	# 다른 디렉토리에서 --undo 해도 되돌릴 수 있도록 journal 에는 절대 경로를 남긴다.
+	top=os.path.abspath(os.fsencode(top))
+	todo=[]
+	for root, dirs, files in os.walk(top):
+		dirs[:]=[d for d in dirs if os.fsdecode(d) not in (cvs_path, copy_path)]
+		for name in dirs + files:
+			if os.fsdecode(name) == self_file:
+				continue
+			new=to_utf8(name)
+			if new != name:
+				todo.append((os.path.join(root, name), os.path.join(root, new)))
+
+	# 하위 항목부터 바꿔야 상위 디렉토리 경로가 유지된다.
+	todo.reverse()
+	start=time.monotonic()
+	done=0
+	with open(journal, 'a', encoding='utf-8') as j:
+		for src, dest in todo:
+			if os.path.lexists(dest):
+				print(">>> SKIP RENAME, EXISTS : %s" % os.fsdecode(dest))
+				continue
+			# 먼저 journal 에 쓰고 나서 rename 해야 중간에 죽어도 되돌릴 수 있다.
+			j.write(json.dumps({"src": os.fsdecode(src), "dest": os.fsdecode(dest)}) + "\n")
+			j.flush()
+			os.fsync(j.fileno())
+			os.rename(src, dest)
+			print("RENAME : %s" % os.fsdecode(dest))
+			done+=1
+	elapsed=time.monotonic() - start
+
+	print("==================================================")
+	print("  %d renamed in %.2fs, journal : %s" % (done, elapsed, journal))
+	print("==================================================")
+
+def undo_rename(journal):
+	"""rename_tree 의 journal 을 거꾸로 따라가며 원래 이름으로 되돌린다."""
+	with open(journal, 'r', encoding='utf-8') as j:
+		entries=[json.loads(line) for line in j if line.strip()]
+
+	done=0
+	for e in reversed(entries):
+		src=os.fsencode(e["src"])
+		dest=os.fsencode(e["dest"])
+		if not os.path.lexists(dest) or os.path.lexists(src):
+			print(">>> SKIP UNDO : %s" % e["dest"])
+			continue
+		os.rename(dest, src)
+		print("UNDO : %s" % e["src"])
+		done+=1
+
+	print("==================================================")
+	print("  %d restored from %s" % (done, journal))
+	print("==================================================")
+
+def main():
+	parser=argparse.ArgumentParser(description='EUC-KR 파일명을 UTF-8 로 바꾼 "%s" 사본을 만든다.' % copy_path)
+	parser.add_argument('dir', nargs='?', default=current_path, help='원본 디렉토리 (기본: 현재 디렉토리)')
+	parser.add_argument('-j', '--jobs', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+	                    help='동시에 복사할 파일 수')
+	parser.add_argument('-s', '--sync', action='store_true',
+	                    help='manifest 를 보고 바뀐 파일만 복사하고, 원본이 없어진 파일은 지운다')
+	mode=parser.add_mutually_exclusive_group()
+	mode.add_argument('-l', '--link', action='store_true',
+	                  help='복사하지 않고 hardlink 로 "%s" 를 만든다' % copy_path)
+	mode.add_argument('-r', '--rename', metavar='JOURNAL',
+	                  help='사본 없이 제자리에서 이름을 바꾸고 JOURNAL 에 기록한다')
+	mode.add_argument('-u', '--undo', metavar='JOURNAL',
+	                  help='--rename 의 JOURNAL 로 원래 이름을 되돌린다')
+	args=parser.parse_args()
+	if args.sync and (args.rename or args.undo):
+		parser.error('-s cannot be used with -r/-u')
+	if args.rename:
+		rename_tree(args.dir, args.rename)
+	elif args.undo:
+		undo_rename(args.undo)
+	else:
+		run(args.dir, args.jobs, args.sync, args.link)
+
+if __name__ == '__main__':
+	main()